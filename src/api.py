@@ -1,6 +1,20 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from itertools import chain
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
 
 
 from src.etl import (
@@ -12,11 +26,75 @@ from src.etl import (
     build_reconciled_dataset,
 )
 
-app = FastAPI()
 
-# In-memory storage for demo purposes only.
-CUSTOMERS_DF = None
-ORDERS_DF = None
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Datasets from a previous run must not be served after a restart.
+    # Every worker runs this, so only directories of deployments that are
+    # no longer running are removed, never this deployment's own.
+    _remove_stale_deployments()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Cleaned datasets are stored as Arrow IPC files and memory-mapped on read,
+# so every worker process sees the latest upload and shares its pages.
+# They hold customer PII: the directory is private to this user (0700), the
+# files are 0600, and each deployment writes to its own run directory in it,
+# which the next deployment to start removes once this one has stopped.
+# The default is on disk: /dev/shm is RAM-backed and often small (64 MB in
+# Docker). Mapped files are shared through the page cache either way.
+DATA_DIR = os.environ.get(
+    "ETL_DATA_DIR",
+    os.path.join(tempfile.gettempdir(), f"etl_reconciliation-{os.getuid()}"),
+)
+
+
+def _boot_id() -> str:
+    """
+    Return the kernel boot ID, which changes on every reboot.
+    """
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as f:
+            return f.read().strip()
+    except OSError:
+        return "unknown"
+
+
+# Run directory shared by all workers of this deployment. uvicorn --workers
+# spawns its workers with multiprocessing, so they (and any worker restarted
+# by the supervisor) share the supervisor's PID; a single process is its own
+# deployment. Process managers that fork workers without multiprocessing
+# give each worker its own directory. The boot ID keeps a PID reused after
+# a reboot apart.
+_DEPLOYMENT_PID = getattr(multiprocessing.parent_process(), "pid", None) or os.getpid()
+_DEPLOYMENT_DIR = f"run-{_DEPLOYMENT_PID}-{_boot_id()}"
+
+# Datasets mapped by this process: name -> (file version, DataFrame).
+_DATASETS = {}
+
+# Last /reconcile result as one immutable (key, report, summary, full JSON)
+# tuple, keyed by the versions of both dataset files. /reconcile runs on
+# several threads, so the entry is only ever replaced whole, under the lock.
+_RECON_CACHE = None
+_RECON_LOCK = threading.Lock()
+
+# Serialised CSV downloads: filename -> (data version, CSV pieces). There is
+# one entry per download file name, and downloads larger than
+# CSV_CACHE_MAX_BYTES are streamed without being cached.
+_CSV_CACHE = {}
+CSV_CACHE_MAX_BYTES = 32 << 20
+
+# Uploads are parsed and cleaned one block (in bytes) at a time, so only one
+# raw chunk is held in memory alongside the cleaned results.
+CSV_BLOCK_SIZE = 16 << 20
+
+# Rows formatted and serialised per piece of a streamed CSV download.
+CSV_DOWNLOAD_CHUNK_ROWS = 50_000
+
+# Number of chunks cleaned concurrently (and held in flight) per upload.
+CLEAN_WORKERS = os.cpu_count() or 1
 
 
 # ----------------------------
@@ -29,18 +107,268 @@ def _format_uk_dates(df: pd.DataFrame) -> pd.DataFrame:
     """
     df = df.copy()
     for col in df.select_dtypes(include=["datetime64[ns]"]).columns:
-        df[col] = df[col].dt.strftime("%d/%m/%Y")
+        df[col] = _to_strings(df[col])
     return df
 
 
-def _csv_response(df: pd.DataFrame, filename: str):
+def _to_strings(series: pd.Series) -> np.ndarray:
+    """
+    Render a column as strings: UK format for dates, "" for missing values.
+    Each distinct value is formatted once and mapped back by code.
+    """
+    codes, uniques = pd.factorize(series)
+    if pd.api.types.is_datetime64_dtype(series):
+        strings = uniques.strftime("%d/%m/%Y")
+    else:
+        strings = uniques.astype(str)
+
+    # factorize marks missing values with -1, which picks the trailing ""
+    return np.append(np.asarray(strings, dtype=object), "")[codes]
+
+
+def _json_records(df: pd.DataFrame) -> str:
+    """
+    Serialise a DataFrame as a JSON array of string-valued records.
+
+    Each column is stringified once, without intermediate DataFrames, and
+    pandas writes the JSON in C, skipping per-row Python dicts and
+    FastAPI's re-encoding of them.
+    """
+    strings = pd.DataFrame({col: _to_strings(series) for col, series in df.items()})
+    return strings.to_json(orient="records")
+
+
+def _json_response(content: str) -> Response:
+    """
+    Wrap pre-serialised JSON in a response.
+    """
+    return Response(content=content, media_type="application/json")
+
+
+def _dedupe_columns(names) -> list:
+    """
+    Rename repeated column names the way pandas does ("email", "email.1").
+    """
+    counts = {}
+    deduped = []
+    for name in names:
+        new_name = name
+        while new_name in counts:
+            counts[name] += 1
+            new_name = f"{name}.{counts[name]}"
+        counts[new_name] = 0
+        deduped.append(new_name)
+    return deduped
+
+
+def _read_csv_chunks(file: UploadFile):
+    """
+    Stream an uploaded CSV as DataFrame chunks using Arrow's
+    multi-threaded CSV reader.
+
+    Every column is read as text: the streaming reader fixes column types
+    from its first block and would fail on a bad value further down.
+    Type conversion is left to the cleaning functions, which coerce and
+    flag invalid values instead.
+    """
+    # Quoted fields may contain newlines (e.g. multi-line addresses), so
+    # blocks must not be split inside one
+    parse_options = pv.ParseOptions(newlines_in_values=True)
+
+    header = _dedupe_columns(pv.open_csv(file.file, parse_options=parse_options).schema.names)
+    file.file.seek(0)
+
+    reader = pv.open_csv(
+        file.file,
+        read_options=pv.ReadOptions(
+            block_size=CSV_BLOCK_SIZE,
+            column_names=header,
+            skip_rows=1,
+        ),
+        parse_options=parse_options,
+        convert_options=pv.ConvertOptions(
+            column_types={name: pa.string() for name in header},
+            strings_can_be_null=True,
+        ),
+    )
+    for batch in reader:
+        yield batch.to_pandas()
+
+
+def _clean_chunks(chunks, clean) -> pd.DataFrame:
+    """
+    Clean CSV chunks on a thread pool and concatenate them in order.
+
+    Arrow string kernels and pandas' C loops release the GIL, so chunks
+    are cleaned on several cores while the reader parses the next block.
+    At most CLEAN_WORKERS chunks are in flight, keeping memory bounded.
+    """
+    cleaned = []
+    pending = deque()
+
+    with ThreadPoolExecutor(max_workers=CLEAN_WORKERS) as executor:
+        for chunk in chunks:
+            if len(pending) >= CLEAN_WORKERS:
+                cleaned.append(pending.popleft().result())
+            pending.append(executor.submit(clean, chunk))
+
+        cleaned.extend(future.result() for future in pending)
+
+    return pd.concat(cleaned, ignore_index=True)
+
+
+def _data_dir() -> str:
+    """
+    Create DATA_DIR and this deployment's run directory (both 0700) if
+    needed, check that this user owns DATA_DIR, and return the run
+    directory.
+    """
+    os.makedirs(DATA_DIR, mode=0o700, exist_ok=True)
+
+    stat = os.lstat(DATA_DIR)
+    if os.path.islink(DATA_DIR) or stat.st_uid != os.getuid():
+        raise RuntimeError(f"Data directory {DATA_DIR} is not owned by this user")
+
+    run_dir = os.path.join(DATA_DIR, _DEPLOYMENT_DIR)
+    os.makedirs(run_dir, mode=0o700, exist_ok=True)
+    return run_dir
+
+
+def _dataset_path(name: str) -> str:
+    return os.path.join(DATA_DIR, _DEPLOYMENT_DIR, f"etl_{name}.arrow")
+
+
+def _process_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, but belongs to another user
+        return True
+    return True
+
+
+def _remove_stale_deployments() -> None:
+    """
+    Remove the run directories of deployments that are no longer running:
+    their supervisor has exited, or they are from before the last reboot.
+    """
+    try:
+        entries = os.listdir(DATA_DIR)
+    except FileNotFoundError:
+        return
+
+    boot_id = _boot_id()
+    for entry in entries:
+        parts = entry.split("-", 2)
+        if len(parts) != 3 or parts[0] != "run" or not parts[1].isdigit():
+            continue
+
+        _, pid, entry_boot_id = parts
+        if entry_boot_id != boot_id or not _process_running(int(pid)):
+            shutil.rmtree(os.path.join(DATA_DIR, entry), ignore_errors=True)
+
+
+def _store_dataset(name: str, df: pd.DataFrame) -> None:
+    """
+    Write a cleaned dataset to its Arrow IPC file.
+    The file is written alongside and renamed into place, so readers
+    never see a partial file.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    # Uploads of one dataset may run concurrently, so each write gets its
+    # own temp file (mkstemp creates it 0600)
+    fd, tmp_path = tempfile.mkstemp(dir=_data_dir(), prefix=f"etl_{name}.", suffix=".tmp")
+
+    try:
+        with open(fd, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+        os.replace(tmp_path, _dataset_path(name))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _load_dataset(name: str):
+    """
+    Return (version, DataFrame) for the latest stored dataset, or
+    (None, None) if it has not been uploaded yet.
+
+    The file is memory-mapped, so Arrow-backed columns read straight from
+    pages shared with other workers. It is only re-read when replaced.
+    """
+    try:
+        stat = os.stat(_dataset_path(name))
+    except FileNotFoundError:
+        return None, None
+
+    version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    cached = _DATASETS.get(name)
+
+    if cached is None or cached[0] != version:
+        source = pa.memory_map(_dataset_path(name))
+        cached = (version, pa.ipc.open_file(source).read_all().to_pandas())
+        _DATASETS[name] = cached
+
+    return cached
+
+
+def _cached_csv_response(filename: str, version):
+    """
+    Return the cached CSV download for filename, or None if the data has
+    changed since it was serialised.
+    """
+    cached = _CSV_CACHE.get(filename)
+    if cached is None or cached[0] != version:
+        return None
+
+    return StreamingResponse(
+        iter(cached[1]),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+def _csv_response(df: pd.DataFrame, filename: str, version):
     """
     Convert a DataFrame into a downloadable CSV response.
+
+    Rows are formatted and serialised in chunks as the response streams.
+    A download of up to CSV_CACHE_MAX_BYTES is kept once it completes, and
+    later downloads of the same data version are served without
+    serialising again; larger ones only ever hold one chunk in memory.
     """
-    df = _format_uk_dates(df)
-    csv_str = df.to_csv(index=False)
-    return Response(
-        content=csv_str,
+    cached = _cached_csv_response(filename, version)
+    if cached is not None:
+        return cached
+
+    def serialise():
+        yield df.iloc[:0].to_csv(index=False).encode()
+        for start in range(0, len(df), CSV_DOWNLOAD_CHUNK_ROWS):
+            chunk = _format_uk_dates(df.iloc[start:start + CSV_DOWNLOAD_CHUNK_ROWS])
+            yield chunk.to_csv(index=False, header=False).encode()
+
+    def generate():
+        pieces, size = [], 0
+        for piece in serialise():
+            if pieces is not None:
+                size += len(piece)
+                if size <= CSV_CACHE_MAX_BYTES:
+                    pieces.append(piece)
+                else:
+                    # Too large to cache: stop collecting and just stream
+                    pieces = None
+            yield piece
+
+        if pieces is not None:
+            _CSV_CACHE[filename] = (version, tuple(pieces))
+
+    return StreamingResponse(
+        generate(),
         media_type="text/csv",
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
@@ -51,8 +379,6 @@ def _csv_response(df: pd.DataFrame, filename: str):
 # ----------------------------
 @app.post("/upload/customers")
 async def upload_customers(file: UploadFile = File(...)):
-    global CUSTOMERS_DF
-
     if file.content_type not in ["text/csv", "application/vnd.ms-excel"]:
         raise HTTPException(
             status_code=400,
@@ -60,18 +386,19 @@ async def upload_customers(file: UploadFile = File(...)):
         )
 
     try:
-        df = pd.read_csv(file.file)
+        reader = _read_csv_chunks(file)
+        first_chunk = await run_in_threadpool(next, reader, None)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid CSV file")
     
-    if df.empty:
+    if first_chunk is None or first_chunk.empty:
         raise HTTPException(
             status_code=400,
             detail="Uploaded customers file is empty"
         )
 
     REQUIRED_CUSTOMER_COLUMNS = {"customer_id", "email", "signup_date"}
-    missing = REQUIRED_CUSTOMER_COLUMNS - set(df.columns)
+    missing = REQUIRED_CUSTOMER_COLUMNS - set(first_chunk.columns)
 
     if missing:
         raise HTTPException(
@@ -79,22 +406,25 @@ async def upload_customers(file: UploadFile = File(...)):
             detail=f"Missing required columns: {missing}"
         )
 
+    # Duplicates can span chunks, so validation runs on the combined result.
+    # Parsing and cleaning run in the thread pool to keep the event loop free.
     try:
-        df = clean_customers(df)
+        df = await run_in_threadpool(_clean_chunks, chain([first_chunk], reader), clean_customers)
+        await run_in_threadpool(validate_customers, df)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Data cleaning error: {str(e)}")
-    
-    validate_customers(df)
 
-    CUSTOMERS_DF = df
+    try:
+        await run_in_threadpool(_store_dataset, "customers", df)
+    except (OSError, RuntimeError) as e:
+        raise HTTPException(status_code=500, detail=f"Could not store customers data: {str(e)}")
+
     return {"status": "success", "rows": len(df)}
 
 
 
 @app.post("/upload/orders")
 async def upload_orders(file: UploadFile = File(...)):
-    global ORDERS_DF
-
     if file.content_type not in ["text/csv", "application/vnd.ms-excel"]:
         raise HTTPException(
             status_code=400,
@@ -102,21 +432,22 @@ async def upload_orders(file: UploadFile = File(...)):
         )
 
     try:
-        df = pd.read_csv(file.file)
+        reader = _read_csv_chunks(file)
+        first_chunk = await run_in_threadpool(next, reader, None)
     except Exception:
         raise HTTPException(
             status_code=400,
             detail="Invalid CSV file"
         )
 
-    if df.empty:
+    if first_chunk is None or first_chunk.empty:
         raise HTTPException(
             status_code=400,
             detail="Uploaded orders file is empty"
         )
 
     REQUIRED_ORDER_COLUMNS = {"order_id", "customer_id", "amount", "order_date"}
-    missing = REQUIRED_ORDER_COLUMNS - set(df.columns)
+    missing = REQUIRED_ORDER_COLUMNS - set(first_chunk.columns)
 
     if missing:
         raise HTTPException(
@@ -124,14 +455,19 @@ async def upload_orders(file: UploadFile = File(...)):
             detail=f"Missing required columns: {missing}"
         )
 
+    # Duplicates can span chunks, so validation runs on the combined result.
+    # Parsing and cleaning run in the thread pool to keep the event loop free.
     try:
-        df = clean_orders(df)
+        df = await run_in_threadpool(_clean_chunks, chain([first_chunk], reader), clean_orders)
+        await run_in_threadpool(validate_orders, df)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Data cleaning error: {str(e)}")
-    
-    validate_orders(df)
 
-    ORDERS_DF = df
+    try:
+        await run_in_threadpool(_store_dataset, "orders", df)
+    except (OSError, RuntimeError) as e:
+        raise HTTPException(status_code=500, detail=f"Could not store orders data: {str(e)}")
+
     return {"status": "success", "rows": len(df)}
 
 
@@ -147,35 +483,55 @@ def reconcile(full: bool = False):
     - full=False → summary only
     - full=True  → include full mismatch tables
     """
-    if CUSTOMERS_DF is None or ORDERS_DF is None:
+    global _RECON_CACHE
+
+    customers_version, customers_df = _load_dataset("customers")
+    orders_version, orders_df = _load_dataset("orders")
+
+    if customers_df is None or orders_df is None:
         raise HTTPException(
             status_code=400,
             detail="Upload both customers and orders first"
         )
 
-    report = reconcile_customers_orders(CUSTOMERS_DF, ORDERS_DF)
+    key = (customers_version, orders_version)
+    cached = _RECON_CACHE
+
+    if cached is None or cached[0] != key:
+        report = reconcile_customers_orders(customers_df, orders_df)
+
+        summary = {
+            "total_customers": int(report["summary"]["total_customers"]),
+            "total_orders": int(report["summary"]["total_orders"]),
+            "orders_without_customers": int(report["summary"]["orders_without_customers"]),
+            "customers_without_orders": int(report["summary"]["customers_without_orders"]),
+        }
 
-    summary = {
-        "total_customers": int(report["summary"]["total_customers"]),
-        "total_orders": int(report["summary"]["total_orders"]),
-        "orders_without_customers": int(report["summary"]["orders_without_customers"]),
-        "customers_without_orders": int(report["summary"]["customers_without_orders"]),
-    }
+        cached = (key, report, summary, None)
+        with _RECON_LOCK:
+            _RECON_CACHE = cached
+
+    # Only the local entry is used from here on; another request may
+    # replace the shared one meanwhile
+    _, report, summary, full_json = cached
 
     if not full:
         return summary
 
-    return {
-        "summary": summary,
-        "orders_without_customers": _format_uk_dates(report["orders_without_customers"])
-            .fillna("")
-            .astype(str)
-            .to_dict(orient="records"),
-        "customers_without_orders": _format_uk_dates(report["customers_without_orders"])
-            .fillna("")
-            .astype(str)
-            .to_dict(orient="records"),
-    }
+    # The full tables are only serialised once per cached report
+    if full_json is None:
+        full_json = (
+            '{"summary":' + json.dumps(summary)
+            + ',"orders_without_customers":' + _json_records(report["orders_without_customers"])
+            + ',"customers_without_orders":' + _json_records(report["customers_without_orders"])
+            + "}"
+        )
+
+        with _RECON_LOCK:
+            if _RECON_CACHE is not None and _RECON_CACHE[0] == key:
+                _RECON_CACHE = (key, report, summary, full_json)
+
+    return _json_response(full_json)
 
 
 @app.get("/reconcile/combined")
@@ -183,19 +539,28 @@ def get_combined_dataset(download: bool = False):
     """
     Get the final reconciled (joined) dataset.
     """
-    if CUSTOMERS_DF is None or ORDERS_DF is None:
+    customers_version, customers_df = _load_dataset("customers")
+    orders_version, orders_df = _load_dataset("orders")
+
+    if customers_df is None or orders_df is None:
         raise HTTPException(
             status_code=400,
             detail="Upload both customers and orders first"
         )
 
-    combined_df = build_reconciled_dataset(CUSTOMERS_DF, ORDERS_DF)
-    combined_df = _format_uk_dates(combined_df)
+    version = (customers_version, orders_version)
 
     if download:
-        return _csv_response(combined_df, "reconciled_orders.csv")
+        cached = _cached_csv_response("reconciled_orders.csv", version)
+        if cached is not None:
+            return cached
 
-    return combined_df.fillna("").astype(str).to_dict(orient="records")
+    combined_df = build_reconciled_dataset(customers_df, orders_df)
+
+    if download:
+        return _csv_response(combined_df, "reconciled_orders.csv", version)
+
+    return _json_response(_json_records(combined_df))
 
 
 
@@ -207,10 +572,12 @@ def download_customers():
     """
     Download cleaned customers CSV.
     """
-    if CUSTOMERS_DF is None:
+    version, df = _load_dataset("customers")
+
+    if df is None:
         raise HTTPException(status_code=400, detail="No customers data uploaded")
 
-    return _csv_response(CUSTOMERS_DF, "clean_customers.csv")
+    return _csv_response(df, "clean_customers.csv", version)
 
 
 @app.get("/download/orders")
@@ -218,7 +585,9 @@ def download_orders():
     """
     Download cleaned orders CSV.
     """
-    if ORDERS_DF is None:
+    version, df = _load_dataset("orders")
+
+    if df is None:
         raise HTTPException(status_code=400, detail="No orders data uploaded")
 
-    return _csv_response(ORDERS_DF, "clean_orders.csv")
+    return _csv_response(df, "clean_orders.csv", version)
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import re
 
@@ -5,24 +6,97 @@ import re
 # Constants
 # ----------------------------
 EMAIL_REGEX = r"[^@]+@[^@]+\.[^@]+"
+EMAIL_RE = re.compile(EMAIL_REGEX)
+
+# Arrow-backed strings: contiguous buffers, processed by Arrow's C++ kernels
+STRING_DTYPE = "string[pyarrow]"
+
+# DataFrame.attrs flag set by the cleaning functions once customer_id
+# has been trimmed and lowercased (normalize_customer_id without the
+# float suffix step).
+NORMALIZED_ID_ATTR = "customer_id_normalized"
+
+# Accepted date formats, in priority order: day-first (UK) with any of the
+# usual separators, then ISO.
+DATE_FORMATS = ("%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%Y-%m-%d")
 
 # ----------------------------
 # Helper functions
 # ----------------------------
 
-def normalize_customer_id(series: pd.Series) -> pd.Series:
+def normalize_customer_id(series: pd.Series, strip_float_suffix: bool = True) -> pd.Series:
+    """
+    Normalise customer_id (trimmed, lowercase).
+    Handles float-to-string issues: "1.0" (e.g. from a float export) and
+    "1" are the same customer. The cleaning functions pass
+    strip_float_suffix=False so stored IDs such as "v1.0" are kept intact;
+    the suffix is only stripped from the reconciliation key.
+
+    IDs are dictionary-encoded first so the string work runs once per
+    distinct ID (orders repeat them heavily) and is mapped back by code.
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    normalized = pd.Series(uniques).astype(STRING_DTYPE)
+
+    if strip_float_suffix:
+        normalized = normalized.str.removesuffix(".0")
+
+    normalized = normalized.str.strip().str.lower()
+    return pd.Series(
+        normalized.take(codes).array,
+        index=series.index,
+        name=series.name,
+    )
+
+
+def normalized_customer_ids(df: pd.DataFrame) -> pd.Series:
+    """
+    Return the normalised customer_id column of df.
+    Frames from clean_customers / clean_orders are already trimmed and
+    lowercased, so only the float suffix is stripped.
+    """
+    if df.attrs.get(NORMALIZED_ID_ATTR):
+        return df["customer_id"].str.removesuffix(".0")
+    return normalize_customer_id(df["customer_id"])
+
+
+def parse_dates(series: pd.Series) -> pd.Series:
     """
-    Normalise customer_id.
-    Handles float-to-string issues.
+    Parse dates against the explicit DATE_FORMATS.
+    Values matching none of them become NaT.
+
+    Each distinct value is parsed once and mapped back by code; pandas'
+    own cache=True heuristic gives up when the leading rows are distinct.
     """
-    return (
-        series
-        .astype(str)
-        .str.replace(r"\.0$", "", regex=True)
-        .str.strip()
-        .str.lower()
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    values = pd.Series(uniques)
+    parsed = pd.to_datetime(values, format=DATE_FORMATS[0], errors="coerce")
+
+    # Only values the previous formats rejected are retried
+    for fmt in DATE_FORMATS[1:]:
+        missing = parsed.isna() & values.notna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(values[missing], format=fmt, errors="coerce")
+
+    return pd.Series(
+        parsed.take(codes).array,
+        index=series.index,
+        name=series.name,
     )
 
+
+def encode_keys(left: pd.Series, right: pd.Series):
+    """
+    Factorise two key columns against one shared hashtable.
+    Returns the integer codes for each side and the number of distinct keys.
+    """
+    codes, uniques = pd.factorize(
+        pd.concat([left, right], ignore_index=True),
+        use_na_sentinel=False,
+    )
+    return codes[:len(left)], codes[len(left):], len(uniques)
+
 # ----------------------------
 # CUSTOMER FUNCTIONS
 # ----------------------------
@@ -50,29 +124,28 @@ def clean_customers(df: pd.DataFrame) -> pd.DataFrame:
     - Normalize customer_id (lowercase, trimmed)
     - Flag invalid emails
     - Flag invalid signup dates
-    - Convert signup_date using UK format (DD/MM/YYYY)
+    - Convert signup_date using UK format (DD/MM/YYYY), falling back to ISO
+      (see DATE_FORMATS)
     """
     
     # Drop rows missing customer_id
     df = df.dropna(subset=["customer_id"]).copy()
 
     # Normalize customer IDs to avoid case-sensitive mismatches
-    df["customer_id"] = (
-        df["customer_id"]
-        .astype(str)
-        .str.strip()
-        .str.lower()
-    )
+    df["customer_id"] = normalize_customer_id(df["customer_id"], strip_float_suffix=False)
+    df.attrs[NORMALIZED_ID_ATTR] = True
 
     # Fail if duplicates appear after normalization
     if df["customer_id"].duplicated().any():
         raise ValueError("Duplicate customer IDs found")
 
-    # Flag invalid emails 
-    df["email_valid"] = df["email"].astype(str).str.match(EMAIL_REGEX)
+    # Flag invalid emails. Arrow-backed strings evaluate the pattern with
+    # Arrow's RE2 (DFA) kernel instead of Python's backtracking re per row.
+    df["email"] = df["email"].astype(STRING_DTYPE)
+    df["email_valid"] = df["email"].str.match(EMAIL_RE, na=False).astype(bool)
 
     # Convert signup_date and flag invalid values
-    df["signup_date"] = pd.to_datetime(df["signup_date"], errors="coerce", dayfirst=True)
+    df["signup_date"] = parse_dates(df["signup_date"])
     df["signup_date_valid"] = ~df["signup_date"].isna()
 
     return df
@@ -110,12 +183,8 @@ def clean_orders(df: pd.DataFrame) -> pd.DataFrame:
     df = df.dropna(subset=["order_id", "customer_id"]).copy()
 
     # NORMALIZE customer_id 
-    df["customer_id"] = (
-        df["customer_id"]
-        .astype(str)
-        .str.strip()
-        .str.lower()
-    )
+    df["customer_id"] = normalize_customer_id(df["customer_id"], strip_float_suffix=False)
+    df.attrs[NORMALIZED_ID_ATTR] = True
 
     if df["order_id"].duplicated().any():
         raise ValueError("Duplicate order IDs found")
@@ -125,7 +194,7 @@ def clean_orders(df: pd.DataFrame) -> pd.DataFrame:
     df["amount_valid"] = ~df["amount"].isna()
 
     # Convert order_date to datetime
-    df["order_date"] = pd.to_datetime(df["order_date"], errors="coerce", dayfirst=True)
+    df["order_date"] = parse_dates(df["order_date"])
     df["order_date_valid"] = ~df["order_date"].isna()
 
     return df
@@ -138,21 +207,33 @@ def reconcile_customers_orders(customers_df: pd.DataFrame, orders_df: pd.DataFra
     """
     Reconcile customers and orders.
 
+    Both mismatch tables are anti-joins on the normalised customer_id.
+    Only the key columns are normalised; the unmatched rows are sliced
+    from the inputs instead of copying both DataFrames up front.
     """
 
-    customers_df = customers_df.copy()
-    orders_df = orders_df.copy()
-    customers_df["customer_id"] = normalize_customer_id(customers_df["customer_id"])
-    orders_df["customer_id"] = normalize_customer_id(orders_df["customer_id"])
+    customer_ids = normalized_customer_ids(customers_df)
+    order_customer_ids = normalized_customer_ids(orders_df)
+
+    # Encode both key columns against a single shared hashtable, then
+    # resolve membership for each side with plain lookups on the codes.
+    customer_codes, order_codes, n_keys = encode_keys(customer_ids, order_customer_ids)
 
+    has_customer = np.zeros(n_keys, dtype=bool)
+    has_customer[customer_codes] = True
+    has_order = np.zeros(n_keys, dtype=bool)
+    has_order[order_codes] = True
 
-    orders_without_customers = orders_df[
-        ~orders_df["customer_id"].isin(customers_df["customer_id"])
-    ]
+    orders_mask = ~has_customer[order_codes]
+    customers_mask = ~has_order[customer_codes]
 
-    customers_without_orders = customers_df[
-        ~customers_df["customer_id"].isin(orders_df["customer_id"])
-    ]
+    orders_without_customers = orders_df[orders_mask].assign(
+        customer_id=order_customer_ids[orders_mask]
+    )
+
+    customers_without_orders = customers_df[customers_mask].assign(
+        customer_id=customer_ids[customers_mask]
+    )
 
     summary = {
         "total_customers": len(customers_df),
@@ -173,21 +254,52 @@ def build_reconciled_dataset(customers_df: pd.DataFrame, orders_df: pd.DataFrame
     Return a combined orders + customers dataset.
     Orders are the base (LEFT JOIN).
     """
-    customers_df = customers_df.copy()
-    orders_df = orders_df.copy()
-    customers_df["customer_id"] = normalize_customer_id(customers_df["customer_id"])
-    orders_df["customer_id"] = normalize_customer_id(orders_df["customer_id"])
-
-
-    combined = orders_df.merge(
-        customers_df,
-        on="customer_id",
-        how="left",
-        indicator=True
+    # Shallow copies: only customer_id is replaced, other columns are shared
+    customers_df = customers_df.copy(deep=False)
+    orders_df = orders_df.copy(deep=False)
+    customers_df["customer_id"] = normalized_customer_ids(customers_df)
+    orders_df["customer_id"] = normalized_customer_ids(orders_df)
+
+    customer_codes, order_codes, n_keys = encode_keys(
+        customers_df["customer_id"], orders_df["customer_id"]
     )
 
-    combined["customer_exists"] = combined["_merge"] == "both"
-    combined.drop(columns="_merge", inplace=True)
+    # Row position of each key in customers_df (-1 when there is none)
+    customer_rows = np.arange(len(customers_df))
+    positions = np.full(n_keys, -1, dtype=np.intp)
+    positions[customer_codes] = customer_rows
+
+    unique_customers = (positions[customer_codes] == customer_rows).all()
+    shared_columns = (set(orders_df.columns) & set(customers_df.columns)) - {"customer_id"}
+
+    if unique_customers and not shared_columns:
+        # Every order matches at most one customer, so the LEFT JOIN is a
+        # positional take of the customer columns (missing rows fill as NA)
+        order_positions = positions[order_codes]
+        customer_columns = (
+            customers_df
+            .drop(columns="customer_id")
+            .reset_index(drop=True)
+            .reindex(order_positions)
+            .reset_index(drop=True)
+        )
+        combined = pd.concat(
+            [orders_df.reset_index(drop=True), customer_columns],
+            axis=1,
+        )
+        combined["customer_exists"] = order_positions != -1
+    else:
+        # Duplicate customer IDs or clashing column names need a real merge
+        combined = orders_df.merge(
+            customers_df,
+            on="customer_id",
+            how="left",
+        )
+
+        # The merge keeps order rows in order, repeating each once per
+        # matching customer (once if unmatched), so the flag follows suit
+        matches = np.bincount(customer_codes, minlength=n_keys)[order_codes]
+        combined["customer_exists"] = np.repeat(matches > 0, np.maximum(matches, 1))
 
     for col in ["email_valid", "signup_date_valid"]:
         if col in combined.columns:
@@ -0,0 +1,240 @@
+import errno
+import os
+import stat
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import src.api as api
+from src.etl import NORMALIZED_ID_ATTR, clean_orders
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(api, "DATA_DIR", str(tmp_path / "data"))
+    # Small enough that every test file is read in several chunks
+    monkeypatch.setattr(api, "CSV_BLOCK_SIZE", 64)
+    monkeypatch.setattr(api, "_DATASETS", {})
+    monkeypatch.setattr(api, "_CSV_CACHE", {})
+    monkeypatch.setattr(api, "_RECON_CACHE", None)
+
+    return TestClient(api.app)
+
+
+def upload(client, kind, text):
+    return client.post(
+        f"/upload/{kind}",
+        files={"file": (f"{kind}.csv", text.encode(), "text/csv")},
+    )
+
+
+def customers_csv(ids):
+    rows = [f"{cid},{cid}@example.com,01/01/2023" for cid in ids]
+    return "\n".join(["customer_id,email,signup_date", *rows]) + "\n"
+
+
+def orders_csv(customer_ids):
+    rows = [f"{i},{cid},10.0,01/01/2023" for i, cid in enumerate(customer_ids)]
+    return "\n".join(["order_id,customer_id,amount,order_date", *rows]) + "\n"
+
+
+def test_upload_customers_in_chunks(client, monkeypatch):
+    cleaned_chunks = []
+    clean_customers = api.clean_customers
+
+    def clean(df):
+        cleaned_chunks.append(len(df))
+        return clean_customers(df)
+
+    monkeypatch.setattr(api, "clean_customers", clean)
+
+    response = upload(client, "customers", customers_csv([f"c{i}" for i in range(20)]))
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "success", "rows": 20}
+    assert len(cleaned_chunks) > 1
+    assert sum(cleaned_chunks) == 20
+
+
+def test_duplicate_customer_across_chunks(client):
+    ids = [f"c{i}" for i in range(20)] + ["C0"]
+
+    response = upload(client, "customers", customers_csv(ids))
+
+    assert response.status_code == 400
+    assert "Duplicate" in response.json()["detail"]
+
+
+def test_duplicate_order_across_chunks(client):
+    text = orders_csv([f"c{i}" for i in range(20)]) + "0,c1,5.0,02/01/2023\n"
+
+    response = upload(client, "orders", text)
+
+    assert response.status_code == 400
+    assert "Duplicate" in response.json()["detail"]
+
+
+def test_upload_header_only(client):
+    response = upload(client, "customers", "customer_id,email,signup_date\n")
+
+    assert response.status_code == 400
+    assert "empty" in response.json()["detail"]
+
+
+def test_upload_missing_column(client):
+    response = upload(client, "orders", "order_id,customer_id,amount\n1,c1,10.0\n")
+
+    assert response.status_code == 400
+    assert "order_date" in response.json()["detail"]
+
+
+def test_store_load_round_trip(client):
+    df = clean_orders(pd.DataFrame({
+        "order_id": ["1", "2", "3"],
+        "customer_id": [" A ", "b", "c"],
+        "amount": ["10.5", "invalid", "3"],
+        "order_date": ["01/01/2023", "invalid-date", "2023-01-03"]
+    }))
+
+    api._store_dataset("orders", df)
+    _, loaded = api._load_dataset("orders")
+
+    pd.testing.assert_frame_equal(loaded, df)
+    assert loaded.attrs[NORMALIZED_ID_ATTR] is True
+
+    path = api._dataset_path("orders")
+    run_dir = os.path.dirname(path)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert stat.S_IMODE(os.stat(api.DATA_DIR).st_mode) == 0o700
+    assert stat.S_IMODE(os.stat(run_dir).st_mode) == 0o700
+    assert os.listdir(api.DATA_DIR) == [api._DEPLOYMENT_DIR]
+    assert os.listdir(run_dir) == ["etl_orders.arrow"]
+
+
+def test_concurrent_stores(client):
+    frames = [pd.DataFrame({"customer_id": [f"c{i}"] * 1000}) for i in range(8)]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda df: api._store_dataset("customers", df), frames))
+
+    _, loaded = api._load_dataset("customers")
+
+    assert any(loaded.equals(df) for df in frames)
+    assert os.listdir(os.path.dirname(api._dataset_path("customers"))) == ["etl_customers.arrow"]
+
+
+def test_store_failure(client, monkeypatch):
+    def disk_full(*args, **kwargs):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(api.pa.ipc, "new_file", disk_full)
+
+    response = upload(client, "customers", customers_csv(["c1"]))
+
+    assert response.status_code == 500
+    assert response.json()["detail"] == "Could not store customers data: [Errno 28] No space left on device"
+    assert os.listdir(os.path.dirname(api._dataset_path("customers"))) == []
+
+
+def test_data_dir_unusable(client, tmp_path, monkeypatch):
+    not_a_dir = tmp_path / "file"
+    not_a_dir.write_text("")
+    monkeypatch.setattr(api, "DATA_DIR", str(not_a_dir))
+
+    response = upload(client, "orders", orders_csv(["c1"]))
+
+    assert response.status_code == 500
+    assert response.json()["detail"].startswith("Could not store orders data")
+
+
+def test_reupload_invalidates_caches(client):
+    upload(client, "customers", customers_csv(["c1", "c2"]))
+    upload(client, "orders", orders_csv(["c1", "c1", "c3"]))
+
+    assert client.get("/reconcile").json()["orders_without_customers"] == 1
+    full = client.get("/reconcile", params={"full": True}).json()
+    assert [row["customer_id"] for row in full["customers_without_orders"]] == ["c2"]
+    assert "c2@example.com" in client.get("/download/customers").text
+
+    upload(client, "customers", customers_csv(["c1", "c3", "c4"]))
+
+    summary = client.get("/reconcile").json()
+    assert summary["total_customers"] == 3
+    assert summary["orders_without_customers"] == 0
+    full = client.get("/reconcile", params={"full": True}).json()
+    assert [row["customer_id"] for row in full["customers_without_orders"]] == ["c4"]
+
+    download = client.get("/download/customers").text
+    assert "c2@example.com" not in download
+    assert "c4@example.com" in download
+
+
+def test_worker_restart_keeps_datasets(client):
+    upload(client, "customers", customers_csv(["c1"]))
+    upload(client, "orders", orders_csv(["c1"]))
+
+    # A restarted worker of the same deployment still serves its uploads
+    with TestClient(api.app) as restarted:
+        response = restarted.get("/reconcile")
+
+    assert response.status_code == 200
+    assert response.json()["total_customers"] == 1
+
+
+def test_startup_removes_stale_deployments(client):
+    upload(client, "customers", customers_csv(["c1"]))
+
+    finished = subprocess.Popen([sys.executable, "-c", ""])
+    finished.wait()
+
+    boot_id = api._boot_id()
+    stale = [f"run-{finished.pid}-{boot_id}", f"run-{os.getpid()}-previous-boot"]
+    running = f"run-{os.getppid()}-{boot_id}"
+
+    for name in [*stale, running]:
+        os.makedirs(os.path.join(api.DATA_DIR, name))
+        open(os.path.join(api.DATA_DIR, name, "etl_customers.arrow"), "wb").close()
+
+    with TestClient(api.app):
+        pass
+
+    assert sorted(os.listdir(api.DATA_DIR)) == sorted([api._DEPLOYMENT_DIR, running])
+    assert os.path.exists(api._dataset_path("customers"))
+
+
+def test_float_suffix_ids_reconcile(client):
+    upload(client, "customers", customers_csv(["1", "2"]))
+    upload(client, "orders", orders_csv(["1.0", "2.0"]))
+
+    summary = client.get("/reconcile").json()
+
+    assert summary["orders_without_customers"] == 0
+    assert summary["customers_without_orders"] == 0
+    assert "1.0" in client.get("/download/orders").text
+
+
+def test_upload_newline_in_quoted_field(client):
+    rows = [f'c{i},c{i}@example.com,01/01/2023,"{i} High Street\nLondon"' for i in range(20)]
+    text = "\n".join(["customer_id,email,signup_date,address", *rows]) + "\n"
+
+    response = upload(client, "customers", text)
+
+    assert response.status_code == 200
+    assert response.json()["rows"] == 20
+    _, df = api._load_dataset("customers")
+    assert df["address"].tolist()[19] == "19 High Street\nLondon"
+
+
+def test_upload_duplicate_header(client):
+    text = "customer_id,email,signup_date,email\nc1,c1@example.com,01/01/2023,other@example.com\n"
+
+    response = upload(client, "customers", text)
+
+    assert response.status_code == 200
+    _, df = api._load_dataset("customers")
+    assert list(df.columns[:4]) == ["customer_id", "email", "signup_date", "email.1"]
+    assert df["email.1"].tolist() == ["other@example.com"]
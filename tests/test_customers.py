@@ -51,3 +51,31 @@ def test_remove_duplicate_customer_ids():
 
     with pytest.raises(ValueError, match="Duplicate"):
         clean_customers(input_df)
+
+
+def test_customer_id_kept_as_text():
+    input_df = pd.DataFrame({
+        "customer_id": ["V1.0", "v1", " X "],
+        "email": ["a@test.com", "b@test.com", "c@test.com"],
+        "signup_date": ["01/01/2023", "02/01/2023", "03/01/2023"]
+    })
+
+    # Only trimmed and lowercased; the ".0" suffix is a reconciliation concern
+    assert clean_customers(input_df)["customer_id"].tolist() == ["v1.0", "v1", "x"]
+
+
+def test_signup_date_formats():
+    input_df = pd.DataFrame({
+        "customer_id": [1, 2, 3, 4, 5, 6],
+        "email": ["a@test.com", "b@test.com", "c@test.com", "d@test.com", "e@test.com", "f@test.com"],
+        "signup_date": ["01/02/2023", "2023-02-03", "01-02-2023", "01.02.2023", "01/02/2023 10:00", "2023/02/03"]
+    })
+
+    result_df = clean_customers(input_df)
+
+    # Day-first (UK) first, ISO as fallback; anything else is rejected
+    assert result_df["signup_date"].iloc[0] == pd.Timestamp(2023, 2, 1)
+    assert result_df["signup_date"].iloc[1] == pd.Timestamp(2023, 2, 3)
+    assert result_df["signup_date"].iloc[2] == pd.Timestamp(2023, 2, 1)
+    assert result_df["signup_date"].iloc[3] == pd.Timestamp(2023, 2, 1)
+    assert result_df["signup_date_valid"].tolist() == [True, True, True, True, False, False]
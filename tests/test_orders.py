@@ -44,3 +44,20 @@ def test_invalid_order_date():
 
     assert result_df["order_date_valid"].tolist() == [True, False, True]
     assert pd.isna(result_df.loc[1, "order_date"])
+
+def test_order_date_formats():
+    input_df = pd.DataFrame({
+        "order_id": [1, 2, 3, 4, 5, 6],
+        "customer_id": [10, 20, 30, 40, 50, 60],
+        "amount": [100.0, 150.0, 200.0, 250.0, 300.0, 350.0],
+        "order_date": ["13/01/2023", "2023-01-14", "13-01-2023", "13.01.2023", "13/01/2023 10:00", "2023/01/14"]
+    })
+
+    result_df = clean_orders(input_df)
+
+    # Day-first (UK) first, ISO as fallback; anything else is rejected
+    assert result_df["order_date"].iloc[0] == pd.Timestamp(2023, 1, 13)
+    assert result_df["order_date"].iloc[1] == pd.Timestamp(2023, 1, 14)
+    assert result_df["order_date"].iloc[2] == pd.Timestamp(2023, 1, 13)
+    assert result_df["order_date"].iloc[3] == pd.Timestamp(2023, 1, 13)
+    assert result_df["order_date_valid"].tolist() == [True, True, True, True, False, False]
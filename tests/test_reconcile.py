@@ -1,5 +1,10 @@
 import pandas as pd
-from src.etl import reconcile_customers_orders
+from src.etl import (
+    build_reconciled_dataset,
+    clean_customers,
+    clean_orders,
+    reconcile_customers_orders,
+)
 
 def test_orders_without_customers():
     customers_df = pd.DataFrame({
@@ -94,3 +99,143 @@ def test_empty_dataframes():
     assert len(result["customers_without_orders"]) == 0
     assert result["summary"]["total_customers"] == 0
     assert result["summary"]["total_orders"] == 0
+
+
+def test_build_reconciled_dataset_unmatched_orders():
+    customers_df = clean_customers(pd.DataFrame({
+        "customer_id": ["A", "b"],
+        "email": ["customer1@example.com", "invalid-email"],
+        "signup_date": ["01/01/2023", "02/01/2023"]
+    }))
+
+    orders_df = clean_orders(pd.DataFrame({
+        "order_id": [10, 20, 30],
+        "customer_id": ["a", "c", "B"],
+        "amount": [100.0, 150.0, 200.0],
+        "order_date": ["01/01/2023", "02/01/2023", "03/01/2023"]
+    }))
+
+    result = build_reconciled_dataset(customers_df, orders_df)
+
+    assert result["order_id"].tolist() == [10, 20, 30]
+    assert result["customer_exists"].tolist() == [True, False, True]
+    assert result["email"].tolist()[0] == "customer1@example.com"
+    assert pd.isna(result.loc[1, "email"])
+    assert pd.isna(result.loc[1, "signup_date"])
+    assert result["email_valid"].tolist() == [True, False, False]
+    assert result["signup_date_valid"].tolist() == [True, False, True]
+
+
+def test_build_reconciled_dataset_unique_customers(monkeypatch):
+    customers_df = pd.DataFrame({
+        "customer_id": [1, 2, 3],
+        "email": ["customer1@example.com", "customer2@example.com", "customer3@example.com"],
+    })
+
+    orders_df = pd.DataFrame({
+        "order_id": [10, 20, 30, 40],
+        "customer_id": [3, 1, 3, 4],
+        "amount": [100.0, 150.0, 200.0, 250.0],
+    })
+
+    # Unique customer IDs take the positional join, not a merge
+    def fail(*args, **kwargs):
+        raise AssertionError("merge should not be called")
+
+    monkeypatch.setattr(pd.DataFrame, "merge", fail)
+
+    result = build_reconciled_dataset(customers_df, orders_df)
+
+    assert list(result.columns) == ["order_id", "customer_id", "amount", "email", "customer_exists"]
+    assert result["customer_id"].tolist() == ["3", "1", "3", "4"]
+    assert result["email"].tolist()[:3] == [
+        "customer3@example.com", "customer1@example.com", "customer3@example.com"
+    ]
+    assert pd.isna(result.loc[3, "email"])
+    assert result["customer_exists"].tolist() == [True, True, True, False]
+
+
+def test_build_reconciled_dataset_duplicate_customers():
+    customers_df = pd.DataFrame({
+        "customer_id": [1, 1, 2],
+        "email": ["first@example.com", "second@example.com", "customer2@example.com"],
+    })
+
+    orders_df = pd.DataFrame({
+        "order_id": [10, 20],
+        "customer_id": [1, 2],
+        "amount": [100.0, 150.0],
+    })
+
+    result = build_reconciled_dataset(customers_df, orders_df)
+
+    # Each order repeats once per matching customer, as with a merge
+    assert result["order_id"].tolist() == [10, 10, 20]
+    assert result["email"].tolist() == [
+        "first@example.com", "second@example.com", "customer2@example.com"
+    ]
+    assert result["customer_exists"].tolist() == [True, True, True]
+
+
+def test_build_reconciled_dataset_shared_column():
+    customers_df = pd.DataFrame({
+        "customer_id": [1, 2],
+        "status": ["active", "closed"],
+    })
+
+    orders_df = pd.DataFrame({
+        "order_id": [10, 20, 30],
+        "customer_id": [2, 3, 1],
+        "status": ["paid", "open", "paid"],
+    })
+
+    result = build_reconciled_dataset(customers_df, orders_df)
+
+    assert result["status_x"].tolist() == ["paid", "open", "paid"]
+    assert result["status_y"].tolist()[0] == "closed"
+    assert pd.isna(result.loc[1, "status_y"])
+    assert result["status_y"].tolist()[2] == "active"
+    assert result["customer_exists"].tolist() == [True, False, True]
+
+
+def test_customer_exists_follows_merged_rows():
+    customers_df = pd.DataFrame({
+        "customer_id": [2, 1, 2],
+        "email": ["first2@example.com", "customer1@example.com", "second2@example.com"],
+    })
+
+    orders_df = pd.DataFrame({
+        "order_id": [10, 20, 30, 40, 50],
+        "customer_id": [2, 9, 1, 2, 8],
+        "amount": [100.0, 150.0, 200.0, 250.0, 300.0],
+    })
+
+    result = build_reconciled_dataset(customers_df, orders_df)
+
+    # Order 10 and 40 match customer 2 twice; 20 and 50 have no customer
+    assert result["order_id"].tolist() == [10, 10, 20, 30, 40, 40, 50]
+    assert result["customer_exists"].tolist() == [True, True, False, True, True, True, False]
+    assert result["customer_exists"].tolist() == result["email"].notna().tolist()
+
+
+def test_float_suffix_matches_after_cleaning():
+    customers_df = clean_customers(pd.DataFrame({
+        "customer_id": ["1", "2"],
+        "email": ["customer1@example.com", "customer2@example.com"],
+        "signup_date": ["01/01/2023", "02/01/2023"]
+    }))
+
+    orders_df = clean_orders(pd.DataFrame({
+        "order_id": ["10", "20"],
+        "customer_id": ["1.0", "2.0"],
+        "amount": ["100.0", "150.0"],
+        "order_date": ["01/01/2023", "02/01/2023"]
+    }))
+
+    result = reconcile_customers_orders(customers_df, orders_df)
+    combined = build_reconciled_dataset(customers_df, orders_df)
+
+    assert orders_df["customer_id"].tolist() == ["1.0", "2.0"]
+    assert result["summary"]["orders_without_customers"] == 0
+    assert result["summary"]["customers_without_orders"] == 0
+    assert combined["customer_exists"].tolist() == [True, True]